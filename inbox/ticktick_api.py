@@ -1,11 +1,21 @@
 from __future__ import annotations
 
+import functools
+import hashlib
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Iterable
 from urllib.parse import urlencode
 
 import requests
 from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class TickTickAPIError(Exception):
@@ -19,38 +29,52 @@ TOKEN_URLS = [
 ]
 OPEN_API_BASE = "https://api.ticktick.com/open/v1"
 
+# Shared across requests so repeated calls to TickTick reuse pooled keep-alive connections.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
 
-def build_authorize_url(state: str) -> str:
-    if not settings.TICKTICK_CLIENT_ID:
-        raise TickTickAPIError("Missing TICKTICK_CLIENT_ID/TT_CLIENT_ID in .env")
+# Page refreshes within this window are served from cache instead of hitting TickTick again.
+CACHE_TIMEOUT_SECONDS = 45
 
-    params = {
-        "client_id": settings.TICKTICK_CLIENT_ID,
-        "scope": settings.TICKTICK_SCOPE,
-        "state": state,
-        "redirect_uri": settings.TICKTICK_REDIRECT_URI,
-        "response_type": "code",
-    }
-    return f"{AUTH_URL}?{urlencode(params)}"
 
+@functools.lru_cache(maxsize=1)
+def _oauth_config() -> tuple[str, str, str, str]:
+    # Settings are fixed for the process lifetime; read them once on first use.
+    return (
+        settings.TICKTICK_CLIENT_ID,
+        settings.TICKTICK_CLIENT_SECRET,
+        settings.TICKTICK_REDIRECT_URI,
+        settings.TICKTICK_SCOPE,
+    )
 
-def exchange_code_for_token(code: str) -> dict[str, Any]:
-    payload = {
-        "client_id": settings.TICKTICK_CLIENT_ID,
-        "client_secret": settings.TICKTICK_CLIENT_SECRET,
-        "code": code,
-        "grant_type": "authorization_code",
-        "redirect_uri": settings.TICKTICK_REDIRECT_URI,
-        "scope": settings.TICKTICK_SCOPE,
-    }
 
-    if not settings.TICKTICK_CLIENT_ID or not settings.TICKTICK_CLIENT_SECRET:
-        raise TickTickAPIError("Missing TickTick client id/secret in .env")
+@functools.lru_cache(maxsize=1)
+def _static_auth_query() -> str:
+    # Everything except state is fixed, so encode it once and append state per login.
+    client_id, _, redirect_uri, scope = _oauth_config()
+    return urlencode(
+        {
+            "client_id": client_id,
+            "scope": scope,
+            "redirect_uri": redirect_uri,
+            "response_type": "code",
+        }
+    )
+
+
+def build_authorize_url(state: str) -> str:
+    client_id, _, _, _ = _oauth_config()
+    if not client_id:
+        raise TickTickAPIError("Missing TICKTICK_CLIENT_ID/TT_CLIENT_ID in .env")
+
+    return f"{AUTH_URL}?{_static_auth_query()}&{urlencode({'state': state})}"
+
 
+def _request_token(payload: dict[str, Any]) -> dict[str, Any]:
     last_error = "Token exchange failed"
     for token_url in TOKEN_URLS:
         try:
-            response = requests.post(token_url, data=payload, timeout=20)
+            response = _SESSION.post(token_url, data=payload, timeout=20)
             if response.ok:
                 data = response.json()
                 if "access_token" in data:
@@ -66,33 +90,121 @@ def exchange_code_for_token(code: str) -> dict[str, Any]:
     raise TickTickAPIError(last_error)
 
 
+def exchange_code_for_token(code: str) -> dict[str, Any]:
+    client_id, client_secret, redirect_uri, scope = _oauth_config()
+    payload = {
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "code": code,
+        "grant_type": "authorization_code",
+        "redirect_uri": redirect_uri,
+        "scope": scope,
+    }
+
+    if not client_id or not client_secret:
+        raise TickTickAPIError("Missing TickTick client id/secret in .env")
+
+    return _request_token(payload)
+
+
+def refresh_access_token(refresh_token: str) -> dict[str, Any]:
+    client_id, client_secret, _, _ = _oauth_config()
+    payload = {
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+    }
+
+    if not client_id or not client_secret:
+        raise TickTickAPIError("Missing TickTick client id/secret in .env")
+
+    data = _request_token(payload)
+    # Some token responses omit refresh_token; keep using the one we already have.
+    data.setdefault("refresh_token", refresh_token)
+    return data
+
+
+def token_expires_soon(token: dict[str, Any], leeway_seconds: int = 60) -> bool:
+    expires_at = token.get("expires_at")
+    if not expires_at:
+        return False
+    try:
+        expires = datetime.fromisoformat(str(expires_at))
+    except ValueError:
+        return False
+    return expires - datetime.now(timezone.utc) < timedelta(seconds=leeway_seconds)
+
+
 def api_get(path: str, access_token: str, params: dict[str, Any] | None = None) -> Any:
     url = f"{OPEN_API_BASE}{path}"
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json",
     }
-    response = requests.get(url, headers=headers, params=params, timeout=20)
+    response = _SESSION.get(url, headers=headers, params=params, timeout=20)
     if not response.ok:
         raise TickTickAPIError(f"{response.status_code} {response.text}")
+    if orjson is not None:
+        return orjson.loads(response.content)
     return response.json()
 
 
+def _cache_key(access_token: str, path: str, params: dict[str, Any] | None = None) -> str:
+    # Never use the raw token as a cache key.
+    token_hash = hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+    query = urlencode(sorted(params.items())) if params else ""
+    return f"ticktick:{token_hash}:{path}?{query}"
+
+
+def cached_api_get(path: str, access_token: str, params: dict[str, Any] | None = None) -> Any:
+    key = _cache_key(access_token, path, params)
+    try:
+        return cache.get_or_set(
+            key,
+            lambda: api_get(path, access_token, params=params),
+            timeout=CACHE_TIMEOUT_SECONDS,
+        )
+    except TickTickAPIError as ex:
+        if str(ex).startswith("401"):
+            cache.delete_many(
+                [
+                    key,
+                    _cache_key(access_token, "/project"),
+                    _cache_key(access_token, "/task"),
+                ]
+            )
+        raise
+
+
+def _as_dict_list(value: Any) -> list[dict[str, Any]]:
+    if not isinstance(value, list):
+        return []
+    # TickTick arrays are homogeneous in practice, so reuse them instead of copying.
+    if all(isinstance(item, dict) for item in value):
+        return value
+    return [item for item in value if isinstance(item, dict)]
+
+
 def list_projects(access_token: str) -> list[dict[str, Any]]:
-    data = api_get("/project", access_token)
+    data = cached_api_get("/project", access_token)
     if isinstance(data, list):
-        return data
+        return _as_dict_list(data)
     if isinstance(data, dict) and isinstance(data.get("projects"), list):
-        return data["projects"]
+        return _as_dict_list(data["projects"])
     raise TickTickAPIError("Unexpected projects response")
 
 
 def find_inbox_id(projects: list[dict[str, Any]]) -> str:
+    # The inbox id prefix is the common case; only fall back to name matching when it is absent.
     for p in projects:
-        pid = str(p.get("id", ""))
-        name = str(p.get("name", "")).lower().strip()
-        if pid.startswith("inbox") or name == "inbox":
+        pid = p.get("id")
+        if isinstance(pid, str) and pid.startswith("inbox"):
             return pid
+    for p in projects:
+        name = p.get("name")
+        if isinstance(name, str) and name.strip().lower() == "inbox":
+            return str(p.get("id", ""))
     raise TickTickAPIError("Inbox not found")
 
 
@@ -102,24 +214,30 @@ def _extract_tasks_from_project_data(payload: Any) -> list[dict[str, Any]]:
     for key in ("tasks", "task"):
         value = payload.get(key)
         if isinstance(value, list):
-            return [item for item in value if isinstance(item, dict)]
+            return _as_dict_list(value)
     return []
 
 
-def _dedupe_tasks(tasks: list[dict[str, Any]]) -> list[dict[str, Any]]:
-    seen: set[str] = set()
-    result: list[dict[str, Any]] = []
-    for task in tasks:
-        task_id = str(task.get("id", ""))
-        if task_id and task_id in seen:
-            continue
-        if task_id:
-            seen.add(task_id)
-        result.append(task)
-    return result
+def _dedupe_tasks(*sources: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    # Insertion-ordered dict: first task per id wins, tasks without an id are kept by identity.
+    by_key: dict[str | int, dict[str, Any]] = {}
+    for tasks in sources:
+        for task in tasks:
+            task_id = task.get("id")
+            by_key.setdefault(str(task_id) if task_id else id(task), task)
+    return list(by_key.values())
 
 
-def list_inbox_tasks(access_token: str, inbox_id: str) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+def list_inbox_tasks(
+    access_token: str,
+    inbox_id: str,
+    executor: ThreadPoolExecutor | None = None,
+    all_tasks_future: Future[Any] | None = None,
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            return list_inbox_tasks(access_token, inbox_id, pool, all_tasks_future)
+
     debug: dict[str, Any] = {
         "source_task_endpoint_count": 0,
         "source_project_data_count": 0,
@@ -128,24 +246,42 @@ def list_inbox_tasks(access_token: str, inbox_id: str) -> tuple[list[dict[str, A
     task_endpoint_tasks: list[dict[str, Any]] = []
     project_data_tasks: list[dict[str, Any]] = []
 
+    # Both endpoints are independent, so issue them concurrently and collect afterwards.
+    # When the caller already requested all tasks, the inbox subset is filtered from that
+    # response instead of paying for a second /task round-trip.
+    if all_tasks_future is None:
+        task_endpoint_future = executor.submit(cached_api_get, "/task", access_token, {"projectId": inbox_id})
+    else:
+        task_endpoint_future = all_tasks_future
+    project_data_future = executor.submit(cached_api_get, f"/project/{inbox_id}/data", access_token)
+
+    filter_all_tasks = all_tasks_future is not None
     try:
-        data = api_get("/task", access_token, params={"projectId": inbox_id})
-        if isinstance(data, list):
-            task_endpoint_tasks = [item for item in data if isinstance(item, dict)]
-        elif isinstance(data, dict) and isinstance(data.get("tasks"), list):
-            task_endpoint_tasks = [item for item in data["tasks"] if isinstance(item, dict)]
+        try:
+            data = task_endpoint_future.result()
+        except TickTickAPIError:
+            if not filter_all_tasks:
+                raise
+            # Some accounts fail the unfiltered /task call; the per-project filter still works there.
+            filter_all_tasks = False
+            data = cached_api_get("/task", access_token, {"projectId": inbox_id})
+        items = _as_dict_list(data.get("tasks") if isinstance(data, dict) else data)
+        if filter_all_tasks:
+            task_endpoint_tasks = [item for item in items if _task_project_id(item) == inbox_id]
+        else:
+            task_endpoint_tasks = items
         debug["source_task_endpoint_count"] = len(task_endpoint_tasks)
     except TickTickAPIError as ex:
         debug["task_endpoint_error"] = str(ex)
 
     try:
-        project_data = api_get(f"/project/{inbox_id}/data", access_token)
+        project_data = project_data_future.result()
         project_data_tasks = _extract_tasks_from_project_data(project_data)
         debug["source_project_data_count"] = len(project_data_tasks)
     except TickTickAPIError as ex:
         debug["project_data_error"] = str(ex)
 
-    merged = _dedupe_tasks(task_endpoint_tasks + project_data_tasks)
+    merged = _dedupe_tasks(task_endpoint_tasks, project_data_tasks)
     debug["merged_count"] = len(merged)
     return merged, debug
 
@@ -155,7 +291,7 @@ def _task_project_id(task: dict[str, Any]) -> str:
     return str(pid)
 
 
-def _counts_by_project(tasks: list[dict[str, Any]]) -> dict[str, int]:
+def _counts_by_project(tasks: Iterable[dict[str, Any]]) -> dict[str, int]:
     counts: dict[str, int] = {}
     for task in tasks:
         pid = _task_project_id(task)
@@ -163,45 +299,85 @@ def _counts_by_project(tasks: list[dict[str, Any]]) -> dict[str, int]:
     return counts
 
 
-def normalize_task(task: dict[str, Any]) -> dict[str, Any]:
-    return {
-        "title": task.get("title") or task.get("content") or "(untitled)",
-        "tags": task.get("tags") or [],
-        "created_time": task.get("createdTime") or "",
-        "due_date": task.get("dueDate") or "",
-    }
-
-
-def fetch_inbox_listing(access_token: str) -> tuple[str, list[dict[str, Any]], dict[str, Any]]:
+def _normalize_many(raw_tasks: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    # Lookups are bound to locals for the per-render loop.
+    untitled = "(untitled)"
+    normalized: list[dict[str, Any]] = []
+    append = normalized.append
+    for task in raw_tasks:
+        get = task.get
+        append(
+            {
+                "title": get("title") or get("content") or untitled,
+                "tags": get("tags") or [],
+                "created_time": get("createdTime") or "",
+                "due_date": get("dueDate") or "",
+            }
+        )
+    return normalized
+
+
+def fetch_inbox_listing(
+    access_token: str,
+    debug: bool = False,
+    use_filter_endpoint: bool = False,
+) -> tuple[str, list[dict[str, Any]], dict[str, Any]]:
     projects = list_projects(access_token)
     inbox_id = find_inbox_id(projects)
-    raw_tasks, task_debug = list_inbox_tasks(access_token, inbox_id)
 
     all_tasks_count = None
     all_tasks_error = ""
-    try:
-        all_tasks_payload = api_get("/task", access_token)
-        if isinstance(all_tasks_payload, list):
-            all_tasks_count = len([t for t in all_tasks_payload if isinstance(t, dict)])
-            all_tasks_items = [t for t in all_tasks_payload if isinstance(t, dict)]
-        elif isinstance(all_tasks_payload, dict) and isinstance(all_tasks_payload.get("tasks"), list):
-            all_tasks_items = [t for t in all_tasks_payload["tasks"] if isinstance(t, dict)]
-            all_tasks_count = len(all_tasks_items)
-        else:
-            all_tasks_items = []
-    except TickTickAPIError as ex:
-        all_tasks_error = str(ex)
-        all_tasks_items = []
-
-    all_counts = _counts_by_project(all_tasks_items)
+    all_tasks_payload = None
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        # By default the inbox is derived from the all-tasks response; the /task?projectId
+        # shape is kept behind use_filter_endpoint for debugging, where the account-wide
+        # dump is only fetched when diagnostics are requested. Either way the diagnostics
+        # built from that dump are only computed when debug is set.
+        all_tasks_future = None
+        if debug or not use_filter_endpoint:
+            all_tasks_future = executor.submit(cached_api_get, "/task", access_token)
+        raw_tasks, task_debug = list_inbox_tasks(
+            access_token,
+            inbox_id,
+            executor,
+            all_tasks_future=None if use_filter_endpoint else all_tasks_future,
+        )
+        if debug and all_tasks_future is not None:
+            try:
+                all_tasks_payload = all_tasks_future.result()
+            except TickTickAPIError as ex:
+                all_tasks_error = str(ex)
+
+    all_tasks_list = all_tasks_payload.get("tasks") if isinstance(all_tasks_payload, dict) else all_tasks_payload
+    if isinstance(all_tasks_list, list):
+        all_tasks_list = _as_dict_list(all_tasks_list)
+        all_tasks_count = len(all_tasks_list)
+    else:
+        all_tasks_list = []
+
+    all_counts = _counts_by_project(all_tasks_list)
     inbox_in_all_tasks_count = all_counts.get(inbox_id, 0)
 
-    project_name_by_id = {
-        str(p.get("id", "")): str(p.get("name", ""))
-        for p in projects
-    }
-
     top_projects = sorted(all_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    top_project_ids = {pid for pid, _ in top_projects}
+
+    # One pass over projects builds the debug list and the names needed for the top projects.
+    project_name_by_id: dict[str, str] = {}
+    project_list: list[dict[str, str]] = []
+    for p in projects:
+        pid = str(p.get("id", ""))
+        name = str(p.get("name", ""))
+        if pid in top_project_ids:
+            project_name_by_id[pid] = name
+        project_list.append(
+            {
+                "id": pid,
+                "name": name,
+                "group_id": str(p.get("groupId", "")),
+                "parent_id": str(p.get("parentId", "")),
+            }
+        )
+
     all_tasks_top_projects = [
         {
             "id": pid,
@@ -216,7 +392,7 @@ def fetch_inbox_listing(access_token: str) -> tuple[str, list[dict[str, Any]], d
             "title": str(t.get("title") or t.get("content") or "(untitled)"),
             "project_id": _task_project_id(t),
         }
-        for t in all_tasks_items[:5]
+        for t in all_tasks_list[:5]
     ]
 
     diagnosis = ""
@@ -227,17 +403,7 @@ def fetch_inbox_listing(access_token: str) -> tuple[str, list[dict[str, Any]], d
         elif all_tasks_count == 0:
             diagnosis = "API is connected, but no tasks were returned at all for this token/account."
 
-    project_list = [
-        {
-            "id": str(p.get("id", "")),
-            "name": str(p.get("name", "")),
-            "group_id": str(p.get("groupId", "")),
-            "parent_id": str(p.get("parentId", "")),
-        }
-        for p in projects
-    ]
-
-    debug = {
+    debug_info = {
         "projects_count": len(projects),
         "project_list": project_list[:20],
         "project_list_truncated": len(project_list) > 20,
@@ -249,5 +415,5 @@ def fetch_inbox_listing(access_token: str) -> tuple[str, list[dict[str, Any]], d
         "diagnosis": diagnosis,
         **task_debug,
     }
-    tasks = [normalize_task(t) for t in raw_tasks]
-    return inbox_id, tasks, debug
+    tasks = _normalize_many(raw_tasks)
+    return inbox_id, tasks, debug_info
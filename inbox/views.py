@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import secrets
+from typing import Any
 
+from django.conf import settings
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import redirect, render
 
@@ -10,6 +12,8 @@ from .ticktick_api import (
     build_authorize_url,
     exchange_code_for_token,
     fetch_inbox_listing,
+    refresh_access_token,
+    token_expires_soon,
 )
 
 
@@ -17,13 +21,29 @@ SESSION_TOKEN_KEY = "ticktick_oauth_token"
 SESSION_STATE_KEY = "ticktick_oauth_state"
 
 
+def _refresh_session_token(request: HttpRequest, token: dict[str, Any]) -> dict[str, Any]:
+    refreshed = refresh_access_token(token["refresh_token"])
+    request.session[SESSION_TOKEN_KEY] = refreshed
+    return refreshed
+
+
 def home(request: HttpRequest) -> HttpResponse:
     token = request.session.get(SESSION_TOKEN_KEY)
     if not token or not token.get("access_token"):
         return render(request, "inbox/home.html", {"connected": False})
 
+    include_diagnostics = settings.DEBUG or bool(request.GET.get("debug"))
     try:
-        inbox_id, tasks, debug = fetch_inbox_listing(token["access_token"])
+        if token.get("refresh_token") and token_expires_soon(token):
+            token = _refresh_session_token(request, token)
+        try:
+            inbox_id, tasks, debug = fetch_inbox_listing(token["access_token"], debug=include_diagnostics)
+        except TickTickAPIError as ex:
+            # One refresh + retry when TickTick rejects the stored access token.
+            if not token.get("refresh_token") or not str(ex).startswith("401"):
+                raise
+            token = _refresh_session_token(request, token)
+            inbox_id, tasks, debug = fetch_inbox_listing(token["access_token"], debug=include_diagnostics)
         return render(
             request,
             "inbox/home.html",
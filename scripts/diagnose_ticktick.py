@@ -7,6 +7,17 @@ from pathlib import Path
 from typing import Any
 
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+MAX_SESSIONS_TO_SCAN = 256
 
 
 def _setup_django() -> None:
@@ -22,8 +33,14 @@ def _setup_django() -> None:
 
 def _find_latest_token() -> dict[str, Any] | None:
     from django.contrib.sessions.models import Session
+    from django.utils import timezone
 
-    sessions = Session.objects.order_by("-expire_date")
+    # Only the most recent sessions can plausibly hold a fresh token.
+    sessions = (
+        Session.objects.filter(expire_date__gt=timezone.now())
+        .order_by("-expire_date")[:MAX_SESSIONS_TO_SCAN]
+        .iterator(chunk_size=50)
+    )
     for s in sessions:
         data = s.get_decoded()
         token = data.get("ticktick_oauth_token")
@@ -32,33 +49,43 @@ def _find_latest_token() -> dict[str, Any] | None:
     return None
 
 
+def _parse_json(r: requests.Response) -> Any:
+    if orjson is not None:
+        return orjson.loads(r.content)
+    return r.json()
+
+
 def _api_get(path: str, token: str, params: dict[str, Any] | None = None) -> Any:
     url = f"https://api.ticktick.com/open/v1{path}"
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    r = requests.get(url, headers=headers, params=params, timeout=30)
+    r = _SESSION.get(url, headers=headers, params=params, timeout=30)
     return {
         "status": r.status_code,
         "ok": r.ok,
-        "json": r.json() if r.text else None,
+        "json": _parse_json(r) if r.content else None,
         "text": r.text[:400],
     }
 
 
 def _projects_from_payload(payload: Any) -> list[dict[str, Any]]:
+    from inbox.ticktick_api import _as_dict_list
+
     if isinstance(payload, list):
-        return [p for p in payload if isinstance(p, dict)]
+        return _as_dict_list(payload)
     if isinstance(payload, dict) and isinstance(payload.get("projects"), list):
-        return [p for p in payload["projects"] if isinstance(p, dict)]
+        return _as_dict_list(payload["projects"])
     return []
 
 
 def _tasks_from_payload(payload: Any) -> list[dict[str, Any]]:
+    from inbox.ticktick_api import _as_dict_list
+
     if isinstance(payload, list):
-        return [t for t in payload if isinstance(t, dict)]
+        return _as_dict_list(payload)
     if isinstance(payload, dict):
         for key in ("tasks", "task"):
             if isinstance(payload.get(key), list):
-                return [t for t in payload[key] if isinstance(t, dict)]
+                return _as_dict_list(payload[key])
     return []
 
 
@@ -156,7 +183,11 @@ def main() -> None:
     all_tasks = _tasks_from_payload(all_tasks_resp["json"]) if all_tasks_resp["ok"] else []
     print(f"/task (all) -> status={all_tasks_resp['status']} ok={all_tasks_resp['ok']} count={len(all_tasks)}")
 
-    inbox_from_all = [t for t in all_tasks if str(t.get("projectId", "")) == inbox_id]
+    by_project: dict[str, list[dict[str, Any]]] = {}
+    for t in all_tasks:
+        by_project.setdefault(str(t.get("projectId", "")), []).append(t)
+
+    inbox_from_all = by_project.get(inbox_id, [])
     print(f"All-tasks scan where projectId == inbox_id: {len(inbox_from_all)}")
 
     if filtered_tasks:
@@ -5,32 +5,70 @@ import getpass
 import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any
 
-from dotenv import load_dotenv
 import requests
-from tqdm import tqdm
+
+from ticktick_http import (
+    POOL_MAXSIZE,
+    EtagCache,
+    conditional_get,
+    load_etag_cache,
+    loads_json,
+    make_session,
+    pool_workers,
+    save_etag_cache,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+OPENAPI_URL = "https://api.ticktick.com/open/v1"
+
+_SESSION = make_session()
 
 
 def load_env() -> None:
-    root = Path(__file__).resolve().parents[1]
-    load_dotenv(root / ".env")
+    from dotenv import load_dotenv
 
+    load_dotenv(PROJECT_ROOT / ".env")
 
-def oauth_token_from_django_session() -> str:
-    root = Path(__file__).resolve().parents[1]
-    if str(root) not in sys.path:
-        sys.path.insert(0, str(root))
+
+_DJANGO_READY = False
+
+
+def setup_django() -> None:
+    global _DJANGO_READY
+    if _DJANGO_READY:
+        return
+
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT))
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ticktick_gtd.settings")
 
     import django
 
     django.setup()
+    _DJANGO_READY = True
+
+
+def oauth_token_from_django_session() -> str:
+    setup_django()
 
     from django.contrib.sessions.models import Session
+    from django.utils import timezone
 
-    for session in Session.objects.order_by("-expire_date"):
+    sessions = (
+        Session.objects.filter(expire_date__gte=timezone.now())
+        .order_by("-expire_date")
+        .only("session_data")[:5]
+    )
+    for session in sessions:
         data = session.get_decoded()
         token = data.get("ticktick_oauth_token")
         if isinstance(token, dict) and token.get("access_token"):
@@ -66,43 +104,54 @@ def get_value(d: dict[str, Any], *keys: str, default: Any = None) -> Any:
 
 
 def extract_projects(batch_plain: dict[str, Any]) -> list[dict[str, Any]]:
+    # Payloads come from JSON decoding or model_dump, never dict subclasses, so an exact
+    # type check is enough and cheaper than isinstance.
     for key in ("project_profiles", "projectProfiles", "projects"):
         value = get_value(batch_plain, key)
         if isinstance(value, list):
-            return [x for x in value if isinstance(x, dict)]
+            return [x for x in value if x.__class__ is dict]
     return []
 
 
 def extract_tasks(batch_plain: dict[str, Any]) -> list[dict[str, Any]]:
-    sync_task_bean = get_value(batch_plain, "sync_task_bean", "syncTaskBean", default={})
+    if not isinstance(batch_plain, dict):
+        return []
+
+    sync_task_bean = batch_plain.get("sync_task_bean") or batch_plain.get("syncTaskBean") or {}
     if isinstance(sync_task_bean, dict):
-        update = get_value(sync_task_bean, "update")
+        update = sync_task_bean.get("update")
         if isinstance(update, list):
-            return [x for x in update if isinstance(x, dict)]
+            return [x for x in update if x.__class__ is dict]
 
     for key in ("tasks", "task", "update"):
-        value = get_value(batch_plain, key)
+        value = batch_plain.get(key)
         if isinstance(value, list):
-            return [x for x in value if isinstance(x, dict)]
+            return [x for x in value if x.__class__ is dict]
 
     return []
 
 
+def index_projects(projects: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    return {str(p["id"]): p for p in projects if "id" in p}
+
+
 def find_inbox_candidates(projects: list[dict[str, Any]]) -> list[dict[str, Any]]:
     out: list[dict[str, Any]] = []
+    needle = "inbox"
     for p in projects:
-        pid = str(get_value(p, "id", default=""))
-        name = str(get_value(p, "name", default=""))
-        kind = str(get_value(p, "kind", default=""))
-        ptype = str(get_value(p, "type", default=""))
-        is_inbox = bool(get_value(p, "isInbox", "is_inbox", default=False))
+        get = p.get
+        pid = str(get("id", ""))
+        name = str(get("name", ""))
+        kind = str(get("kind", ""))
+        ptype = str(get("type", ""))
+        is_inbox = bool(get("isInbox", get("is_inbox", False)))
 
         score = 0
-        if pid.startswith("inbox"):
+        if pid.startswith(needle):
             score += 2
-        if "inbox" in name.lower():
+        if needle in name.casefold():
             score += 2
-        if kind.upper() == "INBOX" or ptype.upper() == "INBOX" or is_inbox:
+        if is_inbox or kind.casefold() == needle or ptype.casefold() == needle:
             score += 3
 
         if score > 0:
@@ -121,55 +170,130 @@ def find_inbox_candidates(projects: list[dict[str, Any]]) -> list[dict[str, Any]
     return out
 
 
-def task_project_id(task: dict[str, Any]) -> str:
-    return str(get_value(task, "projectId", "project_id", default=""))
+def task_title(task: dict[str, Any]) -> str:
+    return str(task.get("title") or task.get("content") or "").strip()
 
 
-def task_title(task: dict[str, Any]) -> str:
-    return str(get_value(task, "title", "content", default="")).strip()
+def build_title_index(tasks: list[dict[str, Any]]) -> list[tuple[str, str, dict[str, Any]]]:
+    # Lowercase each title once per batch so any number of searches only do substring scans.
+    index: list[tuple[str, str, dict[str, Any]]] = []
+    for t in tasks:
+        ttitle = task_title(t)
+        index.append((ttitle.lower(), ttitle, t))
+    return index
 
 
-def openapi_get(token: str, path: str) -> requests.Response:
-    url = f"https://api.ticktick.com/open/v1{path}"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
-    return requests.get(url, headers=headers, timeout=30)
+def find_title_matches(
+    title_index: list[tuple[str, str, dict[str, Any]]],
+    title: str,
+    projects_by_id: dict[str, dict[str, Any]] | None = None,
+) -> list[dict[str, Any]]:
+    needle = title.strip().lower()
+    if not needle or not title_index:
+        return []
+    projects_by_id = projects_by_id or {}
+    # Tasks from one source share a key style (OpenAPI camelCase vs pyticktick snake_case),
+    # so pick the project id key once instead of probing both on every match.
+    project_key = "projectId" if "projectId" in title_index[0][2] else "project_id"
+    matches: list[dict[str, Any]] = []
+    for lowered, ttitle, t in title_index:
+        if needle in lowered:
+            pid = str(t.get(project_key, ""))
+            matches.append(
+                {
+                    "id": str(t.get("id", "")),
+                    "title": ttitle,
+                    "projectId": pid,
+                    "projectName": str(projects_by_id.get(pid, {}).get("name", "")),
+                    "status": t.get("status", ""),
+                }
+            )
+    return matches
+
+
+def openapi_get(
+    token: str,
+    path: str,
+    etag_cache: EtagCache | None = None,
+) -> tuple[requests.Response, bytes | None]:
+    return conditional_get(
+        _SESSION,
+        f"{OPENAPI_URL}{path}",
+        etag_cache,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
 
+def run_oauth_mode(
+    title: str,
+    oauth_token: str,
+    max_projects: int = 0,
+    workers: int = 16,
+    prefilter: bool = False,
+    etag_cache_path: str = "",
+) -> None:
+    from tqdm import tqdm
 
-def run_oauth_mode(title: str, oauth_token: str, max_projects: int = 0) -> None:
     print("Using OAuth token mode (OpenAPI)")
 
-    projects_resp = openapi_get(oauth_token, "/project")
-    if not projects_resp.ok:
+    cache_path = Path(etag_cache_path).expanduser().resolve() if etag_cache_path else None
+    etag_cache = load_etag_cache(cache_path, oauth_token) if cache_path else None
+
+    projects_resp, projects_body = openapi_get(oauth_token, "/project", etag_cache)
+    if projects_body is None:
         raise SystemExit(f"Failed /project: {projects_resp.status_code} {projects_resp.text}")
 
-    payload = projects_resp.json() if projects_resp.text else None
+    payload = loads_json(projects_body)
     if isinstance(payload, list):
         projects = [x for x in payload if isinstance(x, dict)]
     elif isinstance(payload, dict) and isinstance(payload.get("projects"), list):
         projects = [x for x in payload["projects"] if isinstance(x, dict)]
     else:
         projects = []
+    projects_by_id = index_projects(projects)
 
     tasks: list[dict[str, Any]] = []
     seen: set[str] = set()
     projects_to_scan = projects[:max_projects] if max_projects and max_projects > 0 else projects
 
-    for p in tqdm(projects_to_scan, desc="OAuth scan", unit="project"):
-        pid = str(get_value(p, "id", default="")).strip()
-        if not pid:
+    pids = [str(p.get("id", "")).strip() for p in projects_to_scan]
+    pids = [pid for pid in pids if pid]
+
+    # Project data requests are independent; fetch them concurrently, then merge in project order.
+    bodies: dict[str, bytes | None] = {}
+    with ThreadPoolExecutor(max_workers=pool_workers(workers)) as executor:
+        futures = {executor.submit(openapi_get, oauth_token, f"/project/{pid}/data", etag_cache): pid for pid in pids}
+        for future in tqdm(
+            as_completed(futures),
+            total=len(futures),
+            desc="OAuth scan",
+            unit="project",
+            mininterval=0.5,
+            smoothing=0,
+        ):
+            bodies[futures[future]] = future.result()[1]
+
+    if cache_path and etag_cache is not None:
+        fetched = [f"{OPENAPI_URL}/project", *(f"{OPENAPI_URL}/project/{pid}/data" for pid in pids)]
+        save_etag_cache(cache_path, oauth_token, etag_cache, keep=fetched)
+
+    # With --prefilter, bodies that cannot contain the title are skipped before JSON parsing.
+    # Only ASCII case is folded at the byte level, so this trades completeness for speed.
+    needle_bytes = title.strip().lower().encode("utf-8") if prefilter else b""
+    skipped = 0
+    for pid in pids:
+        body = bodies[pid]
+        if body is None:
             continue
-        data_resp = openapi_get(oauth_token, f"/project/{pid}/data")
-        if not data_resp.ok:
+        if needle_bytes and needle_bytes not in body.lower():
+            skipped += 1
             continue
-        pd = data_resp.json() if data_resp.text else None
+        pd = loads_json(body)
         ptasks = extract_tasks(pd)
         for t in ptasks:
             if t.get("projectId") in (None, ""):
                 t["projectId"] = pid
-            tid = str(get_value(t, "id", default="")).strip()
+            tid = str(t.get("id", "")).strip()
             if tid and tid in seen:
                 continue
             if tid:
@@ -179,6 +303,8 @@ def run_oauth_mode(title: str, oauth_token: str, max_projects: int = 0) -> None:
     print("\n=== RESULT 1: TOTAL TASK COUNT ===")
     print(f"Projects scanned: {len(projects_to_scan)} / {len(projects)}")
     print(f"Total tasks returned in OAuth mode: {len(tasks)}")
+    if needle_bytes:
+        print(f"Projects skipped by title prefilter (tasks not counted): {skipped}")
 
     print("\n=== RESULT 2: INBOX CANDIDATES ===")
     inbox_candidates = find_inbox_candidates(projects)
@@ -190,22 +316,12 @@ def run_oauth_mode(title: str, oauth_token: str, max_projects: int = 0) -> None:
         )
 
     print("\n=== RESULT 3: TITLE MATCH ===")
-    needle = title.strip().lower()
-    matches = []
-    for t in tasks:
-        ttitle = task_title(t)
-        if needle and needle in ttitle.lower():
-            matches.append(
-                {
-                    "id": str(get_value(t, "id", default="")),
-                    "title": ttitle,
-                    "projectId": task_project_id(t),
-                    "status": get_value(t, "status", default=""),
-                }
-            )
+    matches = find_title_matches(build_title_index(tasks), title, projects_by_id)
     print(f"Matches for {title!r}: {len(matches)}")
     for m in matches[:20]:
-        print(f"- {m['title']} | projectId={m['projectId']} | status={m['status']} | id={m['id']}")
+        print(
+            f"- {m['title']} | project={m['projectName']} ({m['projectId']}) | status={m['status']} | id={m['id']}"
+        )
 
 
 def main() -> None:
@@ -213,6 +329,22 @@ def main() -> None:
     parser.add_argument("--oauth-token", default="", help="Use OAuth access token directly (OpenAPI mode).")
     parser.add_argument("--oauth-from-django-session", action="store_true", help="Load OAuth token from Django session.")
     parser.add_argument("--max-projects", type=int, default=0, help="In OAuth mode, scan only first N projects (0 means all).")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help=f"In OAuth mode, number of concurrent project data requests (capped at {POOL_MAXSIZE}).",
+    )
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        help="In OAuth mode, skip parsing project data that does not contain the title bytes (faster, partial counts).",
+    )
+    parser.add_argument(
+        "--etag-cache",
+        default="",
+        help="In OAuth mode, path to a JSON file used to revalidate responses with ETag/If-None-Match.",
+    )
     parser.add_argument("--username", default="", help="TickTick username/email")
     parser.add_argument("--password", default="", help="TickTick password")
     parser.add_argument("--title", default="Focus Hazafa to balance", help="Task title substring to search.")
@@ -230,7 +362,14 @@ def main() -> None:
         oauth_token = oauth_token_from_django_session()
 
     if oauth_token:
-        run_oauth_mode(args.title, oauth_token, max_projects=args.max_projects)
+        run_oauth_mode(
+            args.title,
+            oauth_token,
+            max_projects=args.max_projects,
+            workers=args.workers,
+            prefilter=args.prefilter,
+            etag_cache_path=args.etag_cache,
+        )
         return
 
     username = args.username or os.getenv("TICKTICK_USER") or os.getenv("TT_USER") or ""
@@ -258,10 +397,14 @@ def main() -> None:
     if args.dump_json:
         dump_path = Path(args.dump_json).expanduser().resolve()
         dump_path.parent.mkdir(parents=True, exist_ok=True)
-        dump_path.write_text(json.dumps(batch_plain, ensure_ascii=False, indent=2), encoding="utf-8")
+        if orjson is not None:
+            dump_path.write_bytes(orjson.dumps(batch_plain, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            dump_path.write_text(json.dumps(batch_plain, ensure_ascii=False, indent=2), encoding="utf-8")
         print(f"Raw batch JSON saved to: {dump_path}")
 
     projects = extract_projects(batch_plain)
+    projects_by_id = index_projects(projects)
     tasks = extract_tasks(batch_plain)
 
     print("\n=== RESULT 1: TOTAL TASK COUNT ===")
@@ -277,23 +420,13 @@ def main() -> None:
         )
 
     print("\n=== RESULT 3: TITLE MATCH ===")
-    needle = args.title.strip().lower()
-    matches: list[dict[str, Any]] = []
-    for t in tasks:
-        title = task_title(t)
-        if needle and needle in title.lower():
-            matches.append(
-                {
-                    "id": str(get_value(t, "id", default="")),
-                    "title": title,
-                    "projectId": task_project_id(t),
-                    "status": get_value(t, "status", default=""),
-                }
-            )
+    matches = find_title_matches(build_title_index(tasks), args.title, projects_by_id)
 
     print(f"Matches for {args.title!r}: {len(matches)}")
     for m in matches[:20]:
-        print(f"- {m['title']} | projectId={m['projectId']} | status={m['status']} | id={m['id']}")
+        print(
+            f"- {m['title']} | project={m['projectName']} ({m['projectId']}) | status={m['status']} | id={m['id']}"
+        )
 
 
 if __name__ == "__main__":
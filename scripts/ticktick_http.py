@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+EtagCache = dict[str, dict[str, str]]
+
+# Thread fan-out is capped at this so every worker keeps a pooled keep-alive connection.
+POOL_MAXSIZE = 32
+
+
+def make_session() -> requests.Session:
+    session = requests.Session()
+    session.headers.update({"Content-Type": "application/json"})
+    session.mount(
+        "https://",
+        HTTPAdapter(
+            pool_connections=POOL_MAXSIZE,
+            pool_maxsize=POOL_MAXSIZE,
+            # raise_on_status=False hands the last response back, so callers' `resp.ok` checks still apply.
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.2,
+                status_forcelist=[429, 502, 503, 504],
+                raise_on_status=False,
+            ),
+        ),
+    )
+    return session
+
+
+def pool_workers(workers: int) -> int:
+    return min(max(1, workers), POOL_MAXSIZE)
+
+
+def loads_json(raw: bytes) -> Any:
+    # Parse the raw bytes directly; going through resp.text would decode the body to str first.
+    if not raw:
+        return None
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _token_scope(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+def load_etag_cache(path: Path, token: str) -> EtagCache:
+    # Entries are only reused for the token that stored them, so one cache file never
+    # serves another account's task bodies.
+    if not path.is_file():
+        return {}
+    try:
+        data = json.loads(path.read_bytes())
+    except ValueError:
+        return {}
+    if not isinstance(data, dict) or data.get("scope") != _token_scope(token):
+        return {}
+    entries = data.get("entries")
+    return entries if isinstance(entries, dict) else {}
+
+
+def save_etag_cache(path: Path, token: str, cache: EtagCache, keep: Iterable[str]) -> None:
+    # Only the URLs fetched in this run are written back, so stale projects drop out.
+    entries = {url: cache[url] for url in keep if url in cache}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch(mode=0o600, exist_ok=True)
+    path.write_text(
+        json.dumps({"scope": _token_scope(token), "entries": entries}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+
+
+def conditional_get(
+    session: requests.Session,
+    url: str,
+    cache: EtagCache | None = None,
+    headers: dict[str, str] | None = None,
+    timeout: int = 30,
+) -> tuple[requests.Response, bytes | None]:
+    """GET ``url``, revalidating against ``cache`` with If-None-Match when given.
+
+    Returns the response and the body to use: the fresh content on success, the cached
+    body on a 304, and None when the request failed.
+    """
+    cached = cache.get(url) if cache is not None else None
+    request_headers = dict(headers or {})
+    if cached:
+        request_headers["If-None-Match"] = cached["etag"]
+
+    resp = session.get(url, headers=request_headers or None, timeout=timeout)
+    if resp.status_code == 304 and cached:
+        return resp, cached["body"].encode("utf-8")
+    if not resp.ok:
+        return resp, None
+    if cache is not None and resp.headers.get("ETag"):
+        cache[url] = {"etag": resp.headers["ETag"], "body": resp.content.decode("utf-8")}
+    return resp, resp.content
@@ -1,19 +1,40 @@
 from __future__ import annotations
 
 import argparse
+import io
 import json
 import os
+import re
 import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
+from xml.sax.saxutils import escape
 
 import requests
-from dotenv import load_dotenv
-from openpyxl import Workbook
-from tqdm import tqdm
 
+from ticktick_http import (
+    POOL_MAXSIZE,
+    EtagCache,
+    conditional_get,
+    load_etag_cache,
+    loads_json,
+    make_session,
+    pool_workers,
+    save_etag_cache,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
 BASE_URL = "https://api.ticktick.com/open/v1"
 
+_SESSION = make_session()
+
 EXPORT_COLUMNS = [
     "tags",
     "title",
@@ -31,17 +52,18 @@ EXPORT_COLUMNS = [
     "completedTime",
     "modifiedTime",
 ]
+TAGS_IDX = EXPORT_COLUMNS.index("tags")
 
 
 def load_env() -> None:
-    root = Path(__file__).resolve().parents[1]
-    load_dotenv(root / ".env")
+    from dotenv import load_dotenv
+
+    load_dotenv(PROJECT_ROOT / ".env")
 
 
 def token_from_django_session() -> str:
-    root = Path(__file__).resolve().parents[1]
-    if str(root) not in sys.path:
-        sys.path.insert(0, str(root))
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT))
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ticktick_gtd.settings")
 
     import django
@@ -49,8 +71,10 @@ def token_from_django_session() -> str:
     django.setup()
 
     from django.contrib.sessions.models import Session
+    from django.utils import timezone
 
-    for session in Session.objects.order_by("-expire_date"):
+    sessions = Session.objects.filter(expire_date__gt=timezone.now()).order_by("-expire_date")[:25]
+    for session in sessions:
         data = session.get_decoded()
         token = data.get("ticktick_oauth_token")
         if isinstance(token, dict) and token.get("access_token"):
@@ -61,26 +85,62 @@ def token_from_django_session() -> str:
 def parse_params(values: list[str]) -> dict[str, str]:
     params: dict[str, str] = {}
     for value in values:
-        if "=" not in value:
+        key, sep, raw = value.partition("=")
+        if not sep:
             raise ValueError(f"Invalid --param value: {value!r}. Expected key=value")
-        key, raw = value.split("=", 1)
         key = key.strip()
-        raw = raw.strip()
         if not key:
             raise ValueError(f"Invalid --param key in: {value!r}")
-        params[key] = raw
+        params[key] = raw.strip()
     return params
 
 
-def api_get(token: str, path: str, params: dict[str, str] | None = None) -> requests.Response:
+def use_token(token: str, session: requests.Session = _SESSION) -> None:
+    session.headers["Authorization"] = f"Bearer {token}"
+
+
+def api_get(
+    token: str,
+    path: str,
+    params: dict[str, str] | None = None,
+    session: requests.Session = _SESSION,
+) -> requests.Response:
     if not path.startswith("/"):
         path = f"/{path}"
     url = f"{BASE_URL}{path}"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
-    return requests.get(url, headers=headers, params=params, timeout=30)
+    return session.get(url, headers=_auth_headers(token, session) or None, params=params, timeout=30)
+
+
+def _auth_headers(token: str, session: requests.Session) -> dict[str, str]:
+    # The token is normally installed once on the session via use_token(); only send a
+    # per-call header when a different token is passed.
+    auth = f"Bearer {token}"
+    if session.headers.get("Authorization") != auth:
+        return {"Authorization": auth}
+    return {}
+
+
+def get_project_data(
+    token: str,
+    project_id: str,
+    cache: EtagCache | None = None,
+    session: requests.Session = _SESSION,
+) -> tuple[requests.Response, bytes | None]:
+    return conditional_get(session, _project_data_url(project_id), cache, headers=_auth_headers(token, session))
+
+
+def _project_data_url(project_id: str) -> str:
+    return f"{BASE_URL}/project/{project_id}/data"
+
+
+def _json(resp: requests.Response) -> Any:
+    return loads_json(resp.content)
+
+
+def _dumps(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, indent=2, ensure_ascii=False)
 
 
 def print_response(resp: requests.Response) -> None:
@@ -88,9 +148,18 @@ def print_response(resp: requests.Response) -> None:
     print(f"ok: {resp.ok}")
     print(f"url: {resp.url}")
     print("-" * 60)
+    if not resp.content:
+        return
+    if not sys.stdout.isatty():
+        # Piped output goes to other tools; pass the body through instead of re-encoding it.
+        sys.stdout.flush()
+        sys.stdout.buffer.write(resp.content)
+        sys.stdout.buffer.write(b"\n")
+        sys.stdout.flush()
+        return
     try:
-        payload: Any = resp.json()
-        print(json.dumps(payload, indent=2, ensure_ascii=False))
+        payload: Any = _json(resp)
+        print(_dumps(payload))
     except ValueError:
         print(resp.text)
 
@@ -122,43 +191,182 @@ def apply_task_filters(
     only_inbox_heuristic: bool,
     only_no_parent: bool,
 ) -> list[dict[str, Any]]:
-    filtered = tasks
-
+    preds: list[Callable[[dict[str, Any]], bool]] = []
     if only_no_project:
-        filtered = [t for t in filtered if has_no_project(t)]
-
+        preds.append(has_no_project)
     if only_inbox_heuristic:
-        filtered = [
-            t
-            for t in filtered
-            if has_no_project(t) or str(t.get("projectId", "")).startswith("inbox")
-        ]
-
+        preds.append(lambda t: has_no_project(t) or str(t.get("projectId", "")).startswith("inbox"))
     if only_no_parent:
-        filtered = [t for t in filtered if has_no_parent(t)]
+        preds.append(has_no_parent)
+
+    if not preds:
+        return tasks
+    # One pass with all active predicates instead of one intermediate list per filter.
+    return [t for t in tasks if all(pred(t) for pred in preds)]
+
+
+def _cell_json(value: Any) -> str:
+    # Always the stdlib encoder, so exported cell text is the same whether or not orjson is installed.
+    return json.dumps(value, ensure_ascii=False)
+
+
+# Characters XML 1.0 cannot carry at all. openpyxl raises on them, so every export path
+# strips them from the row up front and the output never depends on which writer ran.
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _task_row(task: dict[str, Any]) -> list[Any]:
+    # map() drives the fixed column lookups from C, with no per-column bytecode.
+    row = list(map(task.get, EXPORT_COLUMNS))
+    tags = row[TAGS_IDX]
+    if tags.__class__ is list:
+        row[TAGS_IDX] = ", ".join(map(str, tags))
+    # Decoded JSON only ever yields plain dict/list, so exact type checks are enough here.
+    for i, value in enumerate(row):
+        cls = value.__class__
+        if cls is dict or cls is list:
+            value = row[i] = _cell_json(value)
+            cls = str
+        if cls is str:
+            row[i] = _ILLEGAL_XML_CHARS.sub("", value)
+    return row
+
+
+def _export_with_xlsxwriter(xlsxwriter: Any, tasks: list[dict[str, Any]], output_path: Path) -> None:
+    # constant_memory flushes each row to disk as soon as the next one starts.
+    wb = xlsxwriter.Workbook(
+        str(output_path),
+        {"constant_memory": True, "strings_to_formulas": False, "strings_to_urls": False},
+    )
+    try:
+        ws = wb.add_worksheet("tasks")
+        ws.write_row(0, 0, EXPORT_COLUMNS)
+        for i, task in enumerate(tasks, start=1):
+            ws.write_row(i, 0, _task_row(task))
+    finally:
+        wb.close()
 
-    return filtered
 
+def _export_with_openpyxl(tasks: list[dict[str, Any]], output_path: Path) -> None:
+    from openpyxl import Workbook
 
-def export_tasks_to_excel(tasks: list[dict[str, Any]], output_path: Path) -> None:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "tasks"
-
-    ws.append(EXPORT_COLUMNS)
-    for task in tasks:
-        row: list[Any] = []
-        for col in EXPORT_COLUMNS:
-            value = task.get(col)
-            if col == "tags" and isinstance(value, list):
-                value = ", ".join(str(v) for v in value)
-            elif isinstance(value, (dict, list)):
-                value = json.dumps(value, ensure_ascii=False)
-            row.append(value)
-        ws.append(row)
+    # Write-only mode streams rows out instead of keeping every Cell object in memory.
+    wb = Workbook(write_only=True)
+    try:
+        ws = wb.create_sheet("tasks")
+        ws.append(EXPORT_COLUMNS)
+        for task in tasks:
+            ws.append(_task_row(task))
+        wb.save(output_path)
+    finally:
+        wb.close()
+
+
+_XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        _XML_DECL
+        + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        _XML_DECL
+        + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        _XML_DECL
+        + '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="tasks" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        _XML_DECL
+        + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        "</Relationships>"
+    ),
+}
+STREAM_EXPORT_THRESHOLD = 10_000
+
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+_EXPORT_COLUMN_LETTERS = [_column_letter(i) for i in range(len(EXPORT_COLUMNS))]
+
+
+def _xml_cell(ref: str, value: Any) -> str:
+    if value is None:
+        return ""
+    cls = value.__class__
+    if cls is bool:
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if (cls is int or cls is float) and value == value and value not in (float("inf"), float("-inf")):
+        return f'<c r="{ref}"><v>{value!r}</v></c>'
+    text = escape(str(value))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xml_row(row_number: int, values: list[Any]) -> str:
+    cells = "".join(
+        _xml_cell(f"{letter}{row_number}", value)
+        for letter, value in zip(_EXPORT_COLUMN_LETTERS, values)
+    )
+    return f'<row r="{row_number}">{cells}</row>'
+
+
+def export_tasks_to_excel_stream(tasks: list[dict[str, Any]], output_path: Path) -> None:
+    # Writes the sheet XML straight into the zip row by row, so memory stays flat no matter
+    # how many tasks are exported. Strings are inlined, so no shared-strings table is needed.
+    with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        for name, xml in _XLSX_STATIC_PARTS.items():
+            zf.writestr(name, xml)
 
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as raw:
+            sheet = io.TextIOWrapper(raw, encoding="utf-8")
+            sheet.write(_XML_DECL)
+            sheet.write('<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            sheet.write(_xml_row(1, EXPORT_COLUMNS))
+            for row_number, task in enumerate(tasks, start=2):
+                sheet.write(_xml_row(row_number, _task_row(task)))
+            sheet.write("</sheetData></worksheet>")
+            sheet.flush()
+            sheet.detach()
+
+
+def export_tasks_to_excel(tasks: list[dict[str, Any]], output_path: Path) -> None:
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    wb.save(output_path)
+
+    if len(tasks) > STREAM_EXPORT_THRESHOLD:
+        export_tasks_to_excel_stream(tasks, output_path)
+        return
+
+    # xlsxwriter is optional and faster for this append-only workload; openpyxl is the fallback.
+    try:
+        import xlsxwriter
+    except ImportError:
+        _export_with_openpyxl(tasks, output_path)
+        return
+    _export_with_xlsxwriter(xlsxwriter, tasks, output_path)
 
 
 def list_projects(token: str) -> list[dict[str, Any]]:
@@ -166,7 +374,7 @@ def list_projects(token: str) -> list[dict[str, Any]]:
     if not resp.ok:
         raise SystemExit(f"Failed to list projects: {resp.status_code} {resp.text}")
 
-    payload: Any = resp.json() if resp.text else None
+    payload: Any = _json(resp)
     if isinstance(payload, list):
         return [item for item in payload if isinstance(item, dict)]
     if isinstance(payload, dict) and isinstance(payload.get("projects"), list):
@@ -174,34 +382,50 @@ def list_projects(token: str) -> list[dict[str, Any]]:
     return []
 
 
-def list_all_tasks_via_projects(token: str) -> list[dict[str, Any]]:
-    projects = list_projects(token)
-    all_tasks: list[dict[str, Any]] = []
-    seen_ids: set[str] = set()
-
-    for project in tqdm(projects, desc="Scanning projects", unit="project"):
-        project_id = str(project.get("id", "")).strip()
-        if not project_id:
-            continue
+def list_all_tasks_via_projects(
+    token: str,
+    workers: int = 16,
+    cache_path: Path | None = None,
+) -> list[dict[str, Any]]:
+    from tqdm import tqdm
 
-        resp = api_get(token=token, path=f"/project/{project_id}/data")
-        if not resp.ok:
+    projects = list_projects(token)
+    cache = load_etag_cache(cache_path, token) if cache_path else None
+    # Insertion-ordered: first task per id wins, tasks without an id are kept by identity.
+    tasks_by_id: dict[str | int, dict[str, Any]] = {}
+
+    project_ids = [str(project.get("id", "")).strip() for project in projects]
+    project_ids = [project_id for project_id in project_ids if project_id]
+
+    # Requests release the GIL while waiting on the socket, so a thread pool over the pooled
+    # session overlaps the per-project round-trips. Results are merged in project order.
+    bodies: dict[str, bytes | None] = {}
+    with ThreadPoolExecutor(max_workers=pool_workers(workers)) as executor:
+        futures = {
+            executor.submit(get_project_data, token, project_id, cache): project_id
+            for project_id in project_ids
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Scanning projects", unit="project"):
+            bodies[futures[future]] = future.result()[1]
+
+    if cache_path and cache is not None:
+        save_etag_cache(cache_path, token, cache, keep=map(_project_data_url, project_ids))
+
+    for project_id in project_ids:
+        body = bodies[project_id]
+        if body is None:
             continue
 
-        payload: Any = resp.json() if resp.text else None
+        payload: Any = loads_json(body)
         tasks = extract_tasks(payload)
         for task in tasks:
             if "projectId" not in task or task.get("projectId") in (None, ""):
                 task["projectId"] = project_id
 
             tid = str(task.get("id", "")).strip()
-            if tid and tid in seen_ids:
-                continue
-            if tid:
-                seen_ids.add(tid)
-            all_tasks.append(task)
+            tasks_by_id.setdefault(tid or id(task), task)
 
-    return all_tasks
+    return list(tasks_by_id.values())
 
 
 def main() -> None:
@@ -243,6 +467,17 @@ def main() -> None:
         action="store_true",
         help="When response contains tasks, keep only tasks with empty/missing parentId.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help=f"For /all-tasks, number of concurrent project data requests (capped at {POOL_MAXSIZE}).",
+    )
+    parser.add_argument(
+        "--project-cache",
+        default="",
+        help="For /all-tasks, path to a JSON file used to revalidate project data with ETag/If-None-Match.",
+    )
     parser.add_argument(
         "--export-xlsx",
         default="",
@@ -264,10 +499,12 @@ def main() -> None:
             "Missing access token. Reconnect once in the Django app so a session token exists, or pass --token / set TICKTICK_ACCESS_TOKEN."
         )
 
+    use_token(token)
     params = parse_params(args.param)
 
     if args.path.strip().lower() in {"/all-tasks", "all-tasks"}:
-        tasks = list_all_tasks_via_projects(token)
+        cache_path = Path(args.project_cache).expanduser().resolve() if args.project_cache else None
+        tasks = list_all_tasks_via_projects(token, workers=args.workers, cache_path=cache_path)
         print("status: 200")
         print("ok: True")
         print("url: aggregated:/project/*/data")
@@ -289,17 +526,21 @@ def main() -> None:
             print(f"exported: {output}")
             return
 
-        print(json.dumps(filtered, indent=2, ensure_ascii=False))
+        print(_dumps(filtered))
         return
 
     resp = api_get(token=token, path=args.path, params=params)
 
-    try:
-        payload: Any = resp.json() if resp.text else None
-    except ValueError:
-        payload = None
+    # Only decode the body when a filter or export needs the tasks; print_response
+    # handles plain and piped output on its own.
+    payload: Any = None
+    if args.only_no_project or args.only_inbox_heuristic or args.only_no_parent or args.export_xlsx:
+        try:
+            payload = _json(resp)
+        except ValueError:
+            payload = None
 
-    if (args.only_no_project or args.only_inbox_heuristic or args.only_no_parent or args.export_xlsx) and payload is not None:
+    if payload is not None:
         tasks = extract_tasks(payload)
         if tasks:
             filtered = apply_task_filters(
@@ -322,7 +563,7 @@ def main() -> None:
                 print(f"exported: {output}")
                 return
 
-            print(json.dumps(filtered, indent=2, ensure_ascii=False))
+            print(_dumps(filtered))
             return
 
     print_response(resp)
@@ -8,16 +8,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
 
 
+_TRUTHY = frozenset({"1", "true", "yes", "on"})
+
+
 def env(*names: str, default: str = "") -> str:
-    for name in names:
-        value = os.getenv(name)
-        if value:
-            return value
-    return default
+    return next((value for value in map(os.getenv, names) if value), default)
 
 
 SECRET_KEY = env("DJANGO_SECRET_KEY", default="django-insecure-dev-only-change-me")
-DEBUG = env("DEBUG", default="True").lower() in {"1", "true", "yes", "on"}
+DEBUG = env("DEBUG", default="True").lower() in _TRUTHY
 ALLOWED_HOSTS = ["127.0.0.1", "localhost"]
 
 INSTALLED_APPS = [